@@ -198,7 +198,7 @@ def get_auditors_group(settings, session):
     group = Group.get(session, name=group_name)
     if not group:
         raise NoSuchGroup("Please ask your admin to configure the default group for auditors")
-    if not any([p.name == PERMISSION_AUDITOR for p in group.my_permissions()]):
+    if not any(p.name == PERMISSION_AUDITOR for p in group.my_permissions()):
         raise GroupDoesNotHaveAuditPermission()
     return group
 
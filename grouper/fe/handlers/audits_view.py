@@ -28,7 +28,7 @@ class AuditsView(GrouperHandler):
         open_filter = self.get_argument("filter", "Open Audits")
         audits = get_audits(self.session, only_open=(open_filter == "Open Audits"))
 
-        open_audits = any([not audit.complete for audit in audits])
+        open_audits = any(not audit.complete for audit in audits)
         total = audits.count()
         audits = audits.offset(offset).limit(limit).all()
 
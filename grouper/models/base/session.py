@@ -2,12 +2,16 @@ import functools
 import logging
 from typing import TYPE_CHECKING
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session as _Session, sessionmaker
 
 if TYPE_CHECKING:
     from sqlalchemy.engine import Engine
 
+# Key in Session.info for values derived from the database that are only valid until the session
+# next flushes or its transaction ends.  Cleared by listeners on SessionWithoutAdd below.
+TRANSACTION_CACHE_KEY = "transaction_cache"
+
 
 def flush_transaction(method):
     @functools.wraps(method)
@@ -55,4 +59,13 @@ class SessionWithoutAdd(_Session):
         raise NotImplementedError("Use delete method on models instead.")
 
 
+def _clear_transaction_cache(session, *args):
+    """Drop cached values, which may be stale after a flush or detached after the transaction."""
+    session.info.pop(TRANSACTION_CACHE_KEY, None)
+
+
+event.listen(SessionWithoutAdd, "after_flush", _clear_transaction_cache)
+event.listen(SessionWithoutAdd, "after_transaction_end", _clear_transaction_cache)
+
+
 Session = sessionmaker(class_=SessionWithoutAdd)
@@ -1,17 +1,18 @@
 import re
-from collections import defaultdict, namedtuple
+from collections import defaultdict, namedtuple, OrderedDict
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from six import iteritems, itervalues
-from sqlalchemy import asc
+from sqlalchemy import and_, asc
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, raiseload
 
 from grouper.audit import assert_controllers_are_auditors
 from grouper.constants import ARGUMENT_VALIDATION, PERMISSION_ADMIN, PERMISSION_GRANT
 from grouper.email_util import EmailTemplateEngine, send_email
 from grouper.models.audit_log import AuditLog
 from grouper.models.base.constants import OBJ_TYPES_IDX
+from grouper.models.base.session import TRANSACTION_CACHE_KEY
 from grouper.models.comment import Comment
 from grouper.models.counter import Counter
 from grouper.models.group import Group
@@ -26,13 +27,24 @@ from grouper.user_group import get_groups_by_user
 from grouper.util import matches_glob
 
 if TYPE_CHECKING:
+    from jinja2 import Template
     from grouper.models.base.session import Session
     from grouper.models.user import User
+    from grouper.settings import Settings
     from typing import Dict, List, Optional, Set, Tuple
 
 # Singleton
 GLOBAL_OWNERS = object()
 
+# Compiled once since it is checked on every grant
+_ARGUMENT_RE = re.compile(ARGUMENT_VALIDATION + r"$")
+
+# (settings, template) for the permission request email subject, see _get_request_subject_template
+_request_subject_template = (None, None)  # type: Tuple[Optional[Settings], Optional[Template]]
+
+# Key in the session's TRANSACTION_CACHE_KEY dict for get_owners_by_grantable_permission
+_OWNERS_CACHE_KEY = "owners_by_grantable_permission"
+
 # represents all information we care about for a list of permission requests
 Requests = namedtuple(
     "Requests", ["requests", "status_change_by_request_id", "comment_by_status_change_id"]
@@ -134,7 +146,7 @@ def get_or_create_permission(session, name, description=""):
     return perm, is_new
 
 
-def grant_permission(session, group_id, permission_id, argument=""):
+def grant_permission(session, group_id, permission_id, argument="", commit=True):
     """
     Grant a permission to this group. This will fail if the (permission, argument) has already
     been granted to this group.
@@ -143,23 +155,26 @@ def grant_permission(session, group_id, permission_id, argument=""):
         session(models.base.session.Session): database session
         permission(Permission): a Permission object being granted
         argument(str): must match constants.ARGUMENT_VALIDATION
+        commit(bool): if False, only flush the grant. The caller is then responsible for
+            incrementing the "updates" counter and committing, so many grants can share one
+            transaction.
 
     Throws:
         AssertError if argument does not match ARGUMENT_VALIDATION regex
     """
-    assert re.match(
-        ARGUMENT_VALIDATION + r"$", argument
-    ), "Permission argument does not match regex."
+    assert _ARGUMENT_RE.match(argument), "Permission argument does not match regex."
 
     mapping = PermissionMap(permission_id=permission_id, group_id=group_id, argument=argument)
     mapping.add(session)
 
-    Counter.incr(session, "updates")
-
-    session.commit()
+    if commit:
+        Counter.incr(session, "updates")
+        session.commit()
+    else:
+        session.flush()
 
 
-def grant_permission_to_service_account(session, account, permission, argument=""):
+def grant_permission_to_service_account(session, account, permission, argument="", commit=True):
     """
     Grant a permission to this service account. This will fail if the (permission, argument) has
     already been granted to this group.
@@ -169,22 +184,25 @@ def grant_permission_to_service_account(session, account, permission, argument="
         account(ServiceAccount): a ServiceAccount object being granted a permission
         permission(Permission): a Permission object being granted
         argument(str): must match constants.ARGUMENT_VALIDATION
+        commit(bool): if False, only flush the grant. The caller is then responsible for
+            incrementing the "updates" counter and committing, so many grants can share one
+            transaction.
 
     Throws:
         AssertError if argument does not match ARGUMENT_VALIDATION regex
     """
-    assert re.match(
-        ARGUMENT_VALIDATION + r"$", argument
-    ), "Permission argument does not match regex."
+    assert _ARGUMENT_RE.match(argument), "Permission argument does not match regex."
 
     mapping = ServiceAccountPermissionMap(
         permission_id=permission.id, service_account_id=account.id, argument=argument
     )
     mapping.add(session)
 
-    Counter.incr(session, "updates")
-
-    session.commit()
+    if commit:
+        Counter.incr(session, "updates")
+        session.commit()
+    else:
+        session.flush()
 
 
 def enable_permission_auditing(session, permission_name, actor_user_id):
@@ -302,11 +320,21 @@ def filter_grantable_permissions(session, grants, all_permissions=None):
         grantable = grant.argument.split("/", 1)
         if not grantable:
             continue
-        for name, permission_obj in iteritems(all_permissions):
-            if matches_glob(grantable[0], name):
-                result.append((permission_obj, grantable[1] if len(grantable) > 1 else "*"))
 
-    return sorted(result, key=lambda x: x[0].name + x[1])
+        # avoid glob matching for the common match-all and literal name cases
+        name_glob = grantable[0]
+        if name_glob == "*":
+            permission_objs = all_permissions.values()
+        elif "*" not in name_glob:
+            permission_obj = all_permissions.get(name_glob)
+            permission_objs = [permission_obj] if permission_obj else []
+        else:
+            permission_objs = [p for n, p in all_permissions.items() if matches_glob(name_glob, n)]
+
+        argument = grantable[1] if len(grantable) > 1 else "*"
+        result.extend((permission_obj, argument) for permission_obj in permission_objs)
+
+    return sorted(result, key=lambda x: (x[0].name, x[1]))
 
 
 def get_owners_by_grantable_permission(session, separate_global=False):
@@ -324,46 +352,103 @@ def get_owners_by_grantable_permission(session, separate_global=False):
         A map of permission to argument to owners of the form {permission:
         {argument: [owner1, ...], }, } where 'owners' are models.Group objects.
         And 'argument' can be '*' which means 'anything'.
+
+    Owners derived from Grouper's own grants are cached on the session, as group ids, until the
+    session next flushes or its transaction ends.  Plugin results are never cached.
     """
+    # Pending changes would be autoflushed by the first query below anyway.  Flush them up front
+    # so that they invalidate the cache before it is consulted.
+    if session.autoflush and (session.new or session.dirty or session.deleted):
+        session.flush()
+
+    owners_cache = session.info.setdefault(TRANSACTION_CACHE_KEY, {}).setdefault(
+        _OWNERS_CACHE_KEY, {}
+    )
+    owner_ids_by_arg_by_perm = owners_cache.get(separate_global)
+    if owner_ids_by_arg_by_perm is None:
+        owners_by_arg_by_perm = _get_owners_by_grantable_permission(session, separate_global)
+        owners_cache[separate_global] = {
+            perm: {arg: [owner.id for owner in owners] for arg, owners in owners_by_arg.items()}
+            for perm, owners_by_arg in owners_by_arg_by_perm.items()
+        }
+    else:
+        owners_by_arg_by_perm = _load_owners_by_arg_by_perm(session, owner_ids_by_arg_by_perm)
+
+    # merge in plugin results
+    for res in get_plugin_proxy().get_owner_by_arg_by_perm(session):
+        for perm, owners_by_arg in res.items():
+            perm_owners_by_arg = owners_by_arg_by_perm[perm]
+            for arg, owners in owners_by_arg.items():
+                perm_owners_by_arg[arg].extend(owners)
+
+    return owners_by_arg_by_perm
+
+
+def _load_owners_by_arg_by_perm(session, owner_ids_by_arg_by_perm):
+    """Turn cached owner group ids back into Group objects attached to this session."""
+    group_ids = {
+        group_id
+        for owner_ids_by_arg in owner_ids_by_arg_by_perm.values()
+        for owner_ids in owner_ids_by_arg.values()
+        for group_id in owner_ids
+    }
+    groups_by_id = {}  # type: Dict[int, Group]
+    if group_ids:
+        groups_by_id = {g.id: g for g in session.query(Group).filter(Group.id.in_(group_ids))}
+
+    owners_by_arg_by_perm = defaultdict(lambda: defaultdict(list))
+    for perm, owner_ids_by_arg in owner_ids_by_arg_by_perm.items():
+        for arg, owner_ids in owner_ids_by_arg.items():
+            owners_by_arg_by_perm[perm][arg] = [groups_by_id[i] for i in owner_ids]
+    return owners_by_arg_by_perm
+
+
+def _get_owners_by_grantable_permission(session, separate_global):
+    """Owners from Grouper's own grants, i.e. get_owners_by_grantable_permission sans plugins."""
     all_permissions = {permission.name: permission for permission in get_all_permissions(session)}
-    all_groups = session.query(Group).filter(Group.enabled == True).all()
 
     owners_by_arg_by_perm = defaultdict(lambda: defaultdict(list))
 
-    all_group_permissions = (
-        session.query(Permission.name, PermissionMap.argument, PermissionMap.granted_on, Group)
-        .filter(PermissionMap.group_id == Group.id, Permission.id == PermissionMap.permission_id)
-        .all()
+    # Only groups granted PERMISSION_ADMIN or PERMISSION_GRANT can own anything, so only load
+    # those grants and their groups, streaming the rows instead of buffering the whole result.
+    # Ordered by group so owner lists (and thus approvers and email recipients) are deterministic.
+    owner_grants = (
+        session.query(Group, Permission.name, PermissionMap.argument)
+        .filter(
+            Group.enabled == True,
+            PermissionMap.group_id == Group.id,
+            Permission.id == PermissionMap.permission_id,
+            Permission.name.in_([PERMISSION_ADMIN, PERMISSION_GRANT]),
+        )
+        .order_by(Group.id)
+        .yield_per(1000)
     )
 
+    # partition grants in a single pass
+    owner_groups = OrderedDict()  # type: Dict[int, Group]
+    admin_group_ids = set()  # type: Set[int]
     grants_by_group = defaultdict(list)
+    for group, perm_name, argument in owner_grants:
+        owner_groups.setdefault(group.id, group)
+        if perm_name == PERMISSION_ADMIN:
+            admin_group_ids.add(group.id)
+        else:
+            grants_by_group[group.id].append(Grant(perm_name, argument))
 
-    for grant in all_group_permissions:
-        grants_by_group[grant.Group.id].append(grant)
-
-    for group in all_groups:
+    for group in owner_groups.values():
         # special case permission admins
-        group_permissions = grants_by_group[group.id]
-        if any([g.name == PERMISSION_ADMIN for g in group_permissions]):
+        if group.id in admin_group_ids:
             for perm_name in all_permissions:
                 owners_by_arg_by_perm[perm_name]["*"].append(group)
             if separate_global:
                 owners_by_arg_by_perm[GLOBAL_OWNERS]["*"].append(group)
             continue
 
-        grants = [gp for gp in group_permissions if gp.name == PERMISSION_GRANT]
-
         for perm, arg in filter_grantable_permissions(
-            session, grants, all_permissions=all_permissions
+            session, grants_by_group[group.id], all_permissions=all_permissions
         ):
             owners_by_arg_by_perm[perm.name][arg].append(group)
 
-    # merge in plugin results
-    for res in get_plugin_proxy().get_owner_by_arg_by_perm(session):
-        for perm, owners_by_arg in iteritems(res):
-            for arg, owners in iteritems(owners_by_arg):
-                owners_by_arg_by_perm[perm][arg] += owners
-
     return owners_by_arg_by_perm
 
 
@@ -384,26 +469,25 @@ def get_grantable_permissions(session, restricted_ownership_permissions):
     """
     owners_by_arg_by_perm = get_owners_by_grantable_permission(session)
     args_by_perm = defaultdict(list)
-    for permission, owners_by_arg in iteritems(owners_by_arg_by_perm):
+    for permission, owners_by_arg in owners_by_arg_by_perm.items():
         for argument in owners_by_arg:
             args_by_perm[permission].append(argument)
 
     def _reduce_args(perm_name, args):
-        non_wildcard_args = [a != "*" for a in args]
         if (
             restricted_ownership_permissions
             and perm_name in restricted_ownership_permissions
-            and any(non_wildcard_args)
+            and any(a != "*" for a in args)
         ):
             # at least one none wildcard arg so we only return those and we care
             return sorted({a for a in args if a != "*"})
-        elif all(non_wildcard_args):
+        elif "*" not in args:
             return sorted(set(args))
         else:
             # it's all wildcard so return that one
             return ["*"]
 
-    return {p: _reduce_args(p, a) for p, a in iteritems(args_by_perm)}
+    return {p: _reduce_args(p, a) for p, a in args_by_perm.items()}
 
 
 def get_owner_arg_list(session, permission, argument, owners_by_arg_by_perm=None):
@@ -429,7 +513,7 @@ def get_owner_arg_list(session, permission, argument, owners_by_arg_by_perm=None
 
     all_owner_arg_list = []
     owners_by_arg = owners_by_arg_by_perm[permission.name]
-    for arg, owners in iteritems(owners_by_arg):
+    for arg, owners in owners_by_arg.items():
         if matches_glob(arg, argument):
             all_owner_arg_list += [(owner, arg) for owner in owners]
 
@@ -462,8 +546,33 @@ class PermissionIsDisabled(PermissionRequestException):
     """Trying to operate on a permission that is disabled."""
 
 
-def create_request(session, user, group, permission, argument, reason):
-    # type: (Session, User, Group, Permission, str, str) -> PermissionRequest
+def _get_request_subject_template():
+    # type: () -> Template
+    """Return the subject template for permission request emails.
+
+    Getting a template from a new EmailTemplateEngine sets up a Jinja2 environment and compiles the
+    template, so reuse it for as long as the global settings it was built with are current.
+    """
+    global _request_subject_template
+    current_settings = settings()
+    cached_settings, template = _request_subject_template
+    if cached_settings is not current_settings or template is None:
+        template_engine = EmailTemplateEngine(current_settings)
+        template = template_engine.get_template("email/pending_permission_request_subj.tmpl")
+        _request_subject_template = (current_settings, template)
+    return template
+
+
+def create_request(
+    session,  # type: Session
+    user,  # type: User
+    group,  # type: Group
+    permission,  # type: Permission
+    argument,  # type: str
+    reason,  # type: str
+    owners_by_arg_by_perm=None,  # type: Optional[Dict[object, Dict[str, List[Group]]]]
+):
+    # type: (...) -> PermissionRequest
     """
     Creates an permission request and sends notification to the responsible approvers.
 
@@ -474,6 +583,10 @@ def create_request(session, user, group, permission, argument, reason):
         permission(models.Permission): permission in question to request
         argument(str): argument for the given permission
         reason(str): reason the permission should be granted
+        owners_by_arg_by_perm(Dict): list of groups that can grant a given
+            permission, argument pair as returned by
+            get_owners_by_grantable_permission(session, separate_global=True).
+            Callers creating many requests should fetch this once and pass it in.
 
     Raises:
         RequestAlreadyExists if trying to create a request that is already pending
@@ -481,27 +594,39 @@ def create_request(session, user, group, permission, argument, reason):
         grouper.audit.UserNotAuditor if the group has owners that are not auditors
     """
     # check if group already has perm + arg pair
-    for _, existing_perm_name, _, existing_perm_argument, _ in group.my_permissions():
-        if permission.name == existing_perm_name and argument == existing_perm_argument:
-            raise RequestAlreadyGranted()
+    existing_grant = (
+        session.query(PermissionMap.id)
+        .filter(
+            PermissionMap.group_id == group.id,
+            PermissionMap.permission_id == permission.id,
+            PermissionMap.argument == argument,
+            Permission.id == PermissionMap.permission_id,
+            Permission.enabled == True,
+        )
+        .first()
+    )
+
+    if existing_grant is not None:
+        raise RequestAlreadyGranted()
 
     # check if request already pending for this perm + arg pair
-    existing_count = (
-        session.query(PermissionRequest)
+    existing_request = (
+        session.query(PermissionRequest.id)
         .filter(
             PermissionRequest.group_id == group.id,
             PermissionRequest.permission_id == permission.id,
             PermissionRequest.argument == argument,
             PermissionRequest.status == "pending",
         )
-        .count()
+        .first()
     )
 
-    if existing_count > 0:
+    if existing_request is not None:
         raise RequestAlreadyExists()
 
     # determine owner(s)
-    owners_by_arg_by_perm = get_owners_by_grantable_permission(session, separate_global=True)
+    if owners_by_arg_by_perm is None:
+        owners_by_arg_by_perm = get_owners_by_grantable_permission(session, separate_global=True)
     owner_arg_list = get_owner_arg_list(
         session, permission, argument, owners_by_arg_by_perm=owners_by_arg_by_perm
     )
@@ -555,13 +680,19 @@ def create_request(session, user, group, permission, argument, reason):
     # that's causing this notification
 
     mail_to = []
-    global_owners = owners_by_arg_by_perm[GLOBAL_OWNERS]["*"]
-    non_wildcard_owners = [grant for grant in owner_arg_list if grant[1] != "*"]
-    non_global_owners = [grant for grant in owner_arg_list if grant[0] not in global_owners]
-    if any(non_wildcard_owners):
+    global_owner_ids = {owner.id for owner in owners_by_arg_by_perm[GLOBAL_OWNERS]["*"]}
+    non_wildcard_owners = []
+    non_global_owners = []
+    for grant in owner_arg_list:
+        if grant[1] != "*":
+            non_wildcard_owners.append(grant)
+        if grant[0].id not in global_owner_ids:
+            non_global_owners.append(grant)
+
+    if non_wildcard_owners:
         # non-wildcard owners should get all the notifications
         mailto_owner_arg_list = non_wildcard_owners
-    elif any(non_global_owners):
+    elif non_global_owners:
         mailto_owner_arg_list = non_global_owners
     else:
         # only the wildcards so they get the notifications
@@ -573,8 +704,7 @@ def create_request(session, user, group, permission, argument, reason):
         else:
             mail_to.extend([u for t, u in owner.my_members() if t == "User"])
 
-    template_engine = EmailTemplateEngine(settings())
-    subject_template = template_engine.get_template("email/pending_permission_request_subj.tmpl")
+    subject_template = _get_request_subject_template()
     subject = subject_template.render(permission=permission.name, group=group.name)
     send_email(
         session, set(mail_to), subject, "pending_permission_request", settings(), email_context
@@ -583,6 +713,22 @@ def create_request(session, user, group, permission, argument, reason):
     return request
 
 
+def _permission_request_load_options():
+    """Query options for loading PermissionRequests along with the objects callers read from them.
+
+    With the strict_orm_loading setting enabled, any other relationship access on the loaded
+    requests raises instead of silently issuing a query per request.
+    """
+    options = [
+        joinedload(PermissionRequest.permission),
+        joinedload(PermissionRequest.group),
+        joinedload(PermissionRequest.requester),
+    ]
+    if settings().strict_orm_loading:
+        options.append(raiseload("*"))
+    return options
+
+
 def get_pending_request_by_group(session, group):
     """Load pending request for a particular group.
 
@@ -596,6 +742,7 @@ def get_pending_request_by_group(session, group):
     """
     return (
         session.query(PermissionRequest)
+        .options(*_permission_request_load_options())
         .filter(PermissionRequest.status == "pending", PermissionRequest.group_id == group.id)
         .all()
     )
@@ -636,58 +783,76 @@ def get_requests(
         Requests is the namedtuple with requests and associated
         comments/changes.
     """
-    # get all requests
-    all_requests = session.query(PermissionRequest)
+    # get all requests, along with the objects callers (and the owner filter) need from them
+    all_requests = session.query(PermissionRequest).options(*_permission_request_load_options())
     if status:
         all_requests = all_requests.filter(PermissionRequest.status == status)
     if requester:
         all_requests = all_requests.filter(PermissionRequest.requester_id == requester.id)
 
-    all_requests = all_requests.order_by(PermissionRequest.requested_at.desc()).all()
-
-    if owners_by_arg_by_perm is None:
-        owners_by_arg_by_perm = get_owners_by_grantable_permission(session)
+    all_requests = all_requests.order_by(PermissionRequest.requested_at.desc())
 
     if owner:
+        # whether the owner can action a request is determined in Python, so every candidate
+        # request has to be loaded before paginating
+        if owners_by_arg_by_perm is None:
+            owners_by_arg_by_perm = get_owners_by_grantable_permission(session)
+
+        # many requests share a permission + argument, so only work out who can approve each
+        # distinct pair once
         group_ids = {g.id for g, _ in get_groups_by_user(session, owner)}
-        requests = [
-            request
-            for request in all_requests
-            if can_approve_request(
-                session,
-                request,
-                owner,
-                group_ids=group_ids,
-                owners_by_arg_by_perm=owners_by_arg_by_perm,
-            )
-        ]
+        owner_ids_by_grant = {}  # type: Dict[Tuple[str, str], Set[int]]
+        requests = []
+        for request in all_requests:
+            grant = (request.permission.name, request.argument)
+            owner_ids = owner_ids_by_grant.get(grant)
+            if owner_ids is None:
+                owner_arg_list = get_owner_arg_list(
+                    session, request.permission, request.argument, owners_by_arg_by_perm
+                )
+                owner_ids = {o.id for o, _ in owner_arg_list}
+                owner_ids_by_grant[grant] = owner_ids
+            if not group_ids.isdisjoint(owner_ids):
+                requests.append(request)
+
+        total = len(requests)
+        if limit is None:
+            requests = requests[offset:]
+        else:
+            requests = requests[offset : offset + limit]
     else:
-        requests = all_requests
-
-    total = len(requests)
-    requests = requests[offset:limit]
+        # the ordering doesn't affect the count, so leave it out of the COUNT query
+        total = all_requests.order_by(None).count()
+        requests = all_requests.offset(offset).limit(limit).all()
 
     status_change_by_request_id = defaultdict(list)
     if not requests:
         comment_by_status_change_id = {}
     else:
+        # status changes and their comments in one round-trip
         status_changes = (
-            session.query(PermissionRequestStatusChange)
-            .filter(PermissionRequestStatusChange.request_id.in_([r.id for r in requests]))
-            .all()
-        )
-        for sc in status_changes:
-            status_change_by_request_id[sc.request_id].append(sc)
-
-        comments = (
-            session.query(Comment)
-            .filter(
-                Comment.obj_type == OBJ_TYPES_IDX.index("PermissionRequestStatusChange"),
-                Comment.obj_pk.in_([s.id for s in status_changes]),
+            session.query(PermissionRequestStatusChange, Comment)
+            .outerjoin(
+                Comment,
+                and_(
+                    Comment.obj_type == OBJ_TYPES_IDX.index("PermissionRequestStatusChange"),
+                    Comment.obj_pk == PermissionRequestStatusChange.id,
+                ),
             )
+            .filter(PermissionRequestStatusChange.request_id.in_([r.id for r in requests]))
             .all()
         )
-        comment_by_status_change_id = {c.obj_pk: c for c in comments}
+
+        # comments aren't unique per status change, so a status change may come back once per
+        # comment; only record it the first time it's seen
+        seen_status_change_ids = set()  # type: Set[int]
+        comment_by_status_change_id = {}
+        for sc, comment in status_changes:
+            if sc.id not in seen_status_change_ids:
+                seen_status_change_ids.add(sc.id)
+                status_change_by_request_id[sc.request_id].append(sc)
+            if comment is not None:
+                comment_by_status_change_id[sc.id] = comment
 
     return (Requests(requests, status_change_by_request_id, comment_by_status_change_id), total)
 
@@ -783,9 +948,12 @@ def update_request(
     session.commit()
 
     if new_status == "actioned":
-        # actually grant permission
+        # actually grant permission, committed below along with the audit log entry
         try:
-            grant_permission(session, request.group.id, request.permission.id, request.argument)
+            grant_permission(
+                session, request.group.id, request.permission.id, request.argument, commit=False
+            )
+            Counter.incr(session, "updates")
         except IntegrityError:
             session.rollback()
 
@@ -804,8 +972,7 @@ def update_request(
 
     # send notification
 
-    template_engine = EmailTemplateEngine(settings())
-    subject_template = template_engine.get_template("email/pending_permission_request_subj.tmpl")
+    subject_template = _get_request_subject_template()
     subject = "Re: " + subject_template.render(
         permission=request.permission.name, group=request.group.name
     )
@@ -862,9 +1029,10 @@ def permission_intersection(perms_a, perms_b):
     pdict_b = permission_list_to_dict(perms_b)
     ret = set()
     for perm in perms_a:
-        if perm.name not in pdict_b:
+        perms_b_by_arg = pdict_b.get(perm.name)
+        if not perms_b_by_arg:
             continue
-        if perm.argument in pdict_b[perm.name]:
+        if perm.argument in perms_b_by_arg:
             ret.add(perm)
             continue
         # Unargumented permissions are granted by any permission with the same name
@@ -872,15 +1040,15 @@ def permission_intersection(perms_a, perms_b):
             ret.add(perm)
             continue
         # Argument wildcard
-        if "*" in pdict_b[perm.name]:
+        if "*" in perms_b_by_arg:
             ret.add(perm)
             continue
         # Unargumented permissions are granted by any permission with the same name
-        if "" in pdict_b[perm.name]:
-            ret.add(pdict_b[perm.name][""])
+        if "" in perms_b_by_arg:
+            ret.add(perms_b_by_arg[""])
             continue
         # If this permission is a wildcard, we add all permissions with the same name from
         # the other set
         if perm.argument == "*":
-            ret |= {p for p in itervalues(pdict_b[perm.name])}
+            ret.update(perms_b_by_arg.values())
     return ret
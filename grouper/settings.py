@@ -86,6 +86,7 @@ class Settings(object):
         self.smtp_password = ""
         self.from_addr = "no-reply@grouper.local"
         self.service_account_email_domain = "svc.localhost"
+        self.strict_orm_loading = False
         self.timezone = "UTC"
         self.url = "http://127.0.0.1:8888"
         self.user_auth_header = "X-Grouper-User"
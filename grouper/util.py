@@ -36,21 +36,30 @@ def get_auditors_group_name(settings):
     return settings.auditors_group
 
 
-# TODO(lfaraone): Consider moving this to a LRU cache to avoid memory leaks
+# Compiled glob regexes.  Bounded the same way the re module bounds its own cache: once full, it
+# is simply emptied and refilled, which keeps memory use capped without LRU bookkeeping.
+_REGEX_CACHE_MAX_SIZE = 2048
 _regex_cache = {}  # type: Dict[str, Pattern]
 
 
+def _glob_to_regex(glob):
+    # type: (str) -> Pattern
+    try:
+        return _regex_cache[glob]
+    except KeyError:
+        if len(_regex_cache) >= _REGEX_CACHE_MAX_SIZE:
+            _regex_cache.clear()
+        regex = re.compile(fnmatch.translate(glob))
+        _regex_cache[glob] = regex
+        return regex
+
+
 def matches_glob(glob, text):
     # type: (str, str) -> bool
     """Returns True/False on if text matches glob."""
     if "*" not in glob:
         return text == glob
-    try:
-        regex = _regex_cache[glob]
-    except KeyError:
-        regex = re.compile(fnmatch.translate(glob))
-        _regex_cache[glob] = regex
-    return regex.match(text) is not None
+    return _glob_to_regex(glob).match(text) is not None
 
 
 def singleton(f):
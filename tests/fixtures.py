@@ -172,6 +172,7 @@ def standard_graph(session, graph, users, groups, service_accounts, permissions)
 def session(request, tmpdir):
     # type: (FixtureRequest, LocalPath) -> None
     settings = Settings()
+    settings.strict_orm_loading = True
     set_global_settings(settings)
 
     # Reinitialize plugins in case a previous test configured some.
@@ -1,9 +1,11 @@
 import unittest
 from collections import namedtuple
+from datetime import datetime
 from typing import TYPE_CHECKING
 
 import pytest
 from six.moves.urllib.parse import urlencode
+from sqlalchemy.orm import object_session
 from tornado.httpclient import HTTPError
 from wtforms.validators import ValidationError
 
@@ -19,12 +21,17 @@ from grouper.constants import (
 )
 from grouper.fe.forms import ValidateRegex
 from grouper.models.async_notification import AsyncNotification
+from grouper.models.audit_log import AuditLog
+from grouper.models.base.constants import OBJ_TYPES_IDX
+from grouper.models.comment import Comment
+from grouper.models.counter import Counter
 from grouper.models.group import Group
 from grouper.models.permission_map import PermissionMap
 from grouper.models.service_account import ServiceAccount
 from grouper.models.user import User
 from grouper.permissions import (
     create_permission,
+    create_request,
     get_all_permissions,
     get_grantable_permissions,
     get_owner_arg_list,
@@ -32,6 +39,7 @@ from grouper.permissions import (
     get_permission,
     get_requests,
     grant_permission_to_service_account,
+    update_request,
 )
 from grouper.user_permissions import user_grantable_permissions, user_has_permission
 from tests.fixtures import (  # noqa: F401
@@ -306,6 +314,154 @@ def test_permission_grant_to_owners(
         ), "permission admin should be wildcard owners"
 
 
+def test_owners_by_grantable_permission_cache(
+    session, standard_graph, groups, grantable_permissions  # noqa: F811
+):
+    perm_grant, _, perm1, _ = grantable_permissions
+    grant_permission(groups["all-teams"], perm_grant, argument="grantable.*")
+
+    owners_by_arg_by_perm = get_owners_by_grantable_permission(session)
+    assert groups["all-teams"] in owners_by_arg_by_perm[perm1.name]["*"]
+
+    # callers get their own copy, so mutating it doesn't affect later (cached) calls
+    owners_by_arg_by_perm[perm1.name]["*"].append(groups["team-sre"])
+    owners_by_arg_by_perm = get_owners_by_grantable_permission(session)
+    assert groups["team-sre"] not in owners_by_arg_by_perm[perm1.name]["*"]
+
+    # committing a new grant invalidates the cached result
+    grant_permission(groups["team-sre"], perm_grant, argument=perm1.name)
+    owners_by_arg_by_perm = get_owners_by_grantable_permission(session)
+    assert groups["team-sre"] in owners_by_arg_by_perm[perm1.name]["*"]
+
+    # so does a pending change that doesn't bump the updates counter
+    perm3 = create_permission(session, "grantable.three")
+    owners_by_arg_by_perm = get_owners_by_grantable_permission(session)
+    assert groups["all-teams"] in owners_by_arg_by_perm[perm3.name]["*"]
+
+    # a closed and reused session must hand out groups attached to it, not stale ones
+    session.commit()
+    session.close()
+    owners_by_arg_by_perm = get_owners_by_grantable_permission(session)
+    owners = owners_by_arg_by_perm["grantable.three"]["*"]
+    assert sorted(o.groupname for o in owners) == ["all-teams", "permission-admins"]
+    assert all(object_session(o) is session for o in owners)
+
+
+def test_get_requests_pagination(
+    session, standard_graph, groups, users, grantable_permissions  # noqa: F811
+):
+    perm_grant, _, perm1, _ = grantable_permissions
+    grant_permission(groups["all-teams"], perm_grant, argument="grantable.*")
+
+    requester = users["zorkian@a.co"]
+    for groupname in ("serving-team", "team-infra", "tech-ops"):
+        create_request(session, requester, groups[groupname], perm1, "some argument", "reason")
+
+    # filtered by owner in Python
+    owner = users["testuser@a.co"]
+    request_tuple, total = get_requests(session, "pending", 2, 1, owner=owner)
+    assert total == 3
+    assert len(request_tuple.requests) == 2
+
+    # paginated in the database
+    request_tuple, total = get_requests(session, "pending", 2, 1, requester=requester)
+    assert total == 3
+    assert len(request_tuple.requests) == 2
+
+    request_tuple, total = get_requests(session, "pending", None, 2)
+    assert total == 3
+    assert len(request_tuple.requests) == 1
+
+
+def test_get_requests_multiple_comments(
+    session, standard_graph, groups, users, grantable_permissions  # noqa: F811
+):
+    perm_grant, _, perm1, _ = grantable_permissions
+    grant_permission(groups["all-teams"], perm_grant, argument="grantable.*")
+
+    requester = users["zorkian@a.co"]
+    request = create_request(
+        session, requester, groups["serving-team"], perm1, "some argument", "reason"
+    )
+    request_tuple, _ = get_requests(session, "pending", 10, 0)
+    status_change = request_tuple.status_change_by_request_id[request.id][0]
+    Comment(
+        obj_type=OBJ_TYPES_IDX.index("PermissionRequestStatusChange"),
+        obj_pk=status_change.id,
+        user_id=requester.id,
+        comment="another comment",
+        created_on=datetime.utcnow(),
+    ).add(session)
+    session.commit()
+
+    # a status change with several comments is still only listed once
+    request_tuple, _ = get_requests(session, "pending", 10, 0)
+    assert request_tuple.status_change_by_request_id[request.id] == [status_change]
+    assert status_change.id in request_tuple.comment_by_status_change_id
+
+
+def _updates_count(session):  # noqa: F811
+    counter = session.query(Counter).filter_by(name="updates").scalar()
+    return counter.count if counter else 0
+
+
+def _update_request_audit_entries(session, request):  # noqa: F811
+    return AuditLog.get_entries(
+        session, on_group_id=request.group_id, action="update_perm_request"
+    )
+
+
+def test_update_request_actioned(
+    session, standard_graph, groups, users, grantable_permissions  # noqa: F811
+):
+    perm_grant, _, perm1, _ = grantable_permissions
+    grant_permission(groups["all-teams"], perm_grant, argument="grantable.*")
+
+    group = groups["serving-team"]
+    request = create_request(
+        session, users["zorkian@a.co"], group, perm1, "some argument", "reason"
+    )
+    updates = _updates_count(session)
+    update_request(session, request, users["testuser@a.co"], "actioned", "approved")
+
+    assert request.status == "actioned"
+    assert (
+        session.query(PermissionMap)
+        .filter_by(group_id=group.id, permission_id=perm1.id, argument="some argument")
+        .count()
+        == 1
+    )
+    assert _updates_count(session) == updates + 1
+    assert len(_update_request_audit_entries(session, request)) == 1
+
+
+def test_update_request_actioned_already_granted(
+    session, standard_graph, groups, users, grantable_permissions  # noqa: F811
+):
+    perm_grant, _, perm1, _ = grantable_permissions
+    grant_permission(groups["all-teams"], perm_grant, argument="grantable.*")
+
+    group = groups["serving-team"]
+    request = create_request(
+        session, users["zorkian@a.co"], group, perm1, "some argument", "reason"
+    )
+    grant_permission(group, perm1, argument="some argument")
+
+    # the duplicate grant fails and is rolled back, but the update is still audited
+    updates = _updates_count(session)
+    update_request(session, request, users["testuser@a.co"], "actioned", "approved")
+
+    assert request.status == "actioned"
+    assert (
+        session.query(PermissionMap)
+        .filter_by(group_id=group.id, permission_id=perm1.id, argument="some argument")
+        .count()
+        == 1
+    )
+    assert _updates_count(session) == updates
+    assert len(_update_request_audit_entries(session, request)) == 1
+
+
 def _load_permissions_by_group_name(session, group_name):  # noqa: F811
     group = Group.get(session, name=group_name)
     return [name for _, name, _, _, _ in group.my_permissions()]